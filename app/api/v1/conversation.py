@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Query, Path, Request
+import orjson
 from sqlalchemy import select, func
 from datetime import datetime, timedelta, timezone
 from typing import Optional
@@ -51,9 +52,7 @@ async def finalize_conversation(
     messages = []
     for msg_str in messages_raw:
         try:
-            import json
-
-            messages.append(json.loads(msg_str))
+            messages.append(orjson.loads(msg_str))
         except Exception:
             continue
 
@@ -21,6 +21,7 @@ class Settings(BaseSettings):
 
     # Redis
     redis_url: str = "redis://localhost:6379/0"
+    redis_max_connections: int = 64
 
     # JWT
     jwt_secret_key: str = "your-jwt-secret-key"
@@ -1,6 +1,6 @@
 import redis.asyncio as redis
-from typing import Optional
-import json
+from typing import Optional, Union
+import orjson
 
 from app.config import settings
 
@@ -10,19 +10,26 @@ class RedisClient:
 
     def __init__(self):
         self._client: Optional[redis.Redis] = None
+        self._pool: Optional[redis.BlockingConnectionPool] = None
 
     async def connect(self) -> None:
-        """Initialize Redis connection"""
-        self._client = redis.from_url(
+        """Initialize Redis connection pool"""
+        # Shared by every request and WebSocket; callers wait for a free
+        # connection instead of failing once max_connections are in use
+        self._pool = redis.BlockingConnectionPool.from_url(
             settings.redis_url,
+            max_connections=settings.redis_max_connections,
             encoding="utf-8",
             decode_responses=True,
         )
+        self._client = redis.Redis(connection_pool=self._pool)
 
     async def close(self) -> None:
-        """Close Redis connection"""
+        """Close Redis connection pool"""
         if self._client:
             await self._client.close()
+        if self._pool:
+            await self._pool.disconnect()
 
     @property
     def client(self) -> redis.Redis:
@@ -60,7 +67,7 @@ class RedisClient:
         return await self.client.hset(name, mapping=mapping)
 
     # List operations
-    async def rpush(self, name: str, *values: str) -> int:
+    async def rpush(self, name: str, *values: Union[str, bytes]) -> int:
         return await self.client.rpush(name, *values)
 
     async def lpop(self, name: str) -> Optional[str]:
@@ -93,14 +100,19 @@ class RedisClient:
     async def publish(self, channel: str, message: str) -> int:
         return await self.client.publish(channel, message)
 
+    # Pipelines
+    def pipeline(self, transaction: bool = True):
+        """Batch several commands into one round trip (use as async context manager)"""
+        return self.client.pipeline(transaction=transaction)
+
     # JSON helpers
     async def set_json(self, key: str, data: dict, ex: Optional[int] = None) -> bool:
-        return await self.set(key, json.dumps(data, ensure_ascii=False), ex=ex)
+        return await self.set(key, orjson.dumps(data), ex=ex)
 
     async def get_json(self, key: str) -> Optional[dict]:
         value = await self.get(key)
         if value:
-            return json.loads(value)
+            return orjson.loads(value)
         return None
 
 
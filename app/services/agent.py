@@ -5,7 +5,6 @@ Orchestrates the ASR -> LLM -> TTS pipeline for real-time AI conversation.
 """
 
 import asyncio
-import json
 import re
 import logging
 import base64
@@ -13,6 +12,8 @@ from typing import AsyncGenerator, Optional, List, Dict, Callable, Any
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 
+import orjson
+
 from app.services.asr import asr_service, TranscriptionResult
 from app.services.tts import tts_service
 from app.services.llm import llm_service, Message, StreamChunk
@@ -267,7 +268,7 @@ class AIAgent:
         history = []
         for msg_str in messages_raw:
             try:
-                msg = json.loads(msg_str)
+                msg = orjson.loads(msg_str)
                 if msg.get("type") == "text":
                     history.append(
                         Message(
@@ -349,7 +350,7 @@ class AIAgent:
         }
         await redis_client.rpush(
             f"conv:messages:{conversation_id}",
-            json.dumps(message, ensure_ascii=False),
+            orjson.dumps(message),
         )
 
     async def process_audio(
@@ -151,7 +151,7 @@ class ASRService:
 
     def _build_audio_only_request(
         self, seq: int, segment: bytes, is_last: bool = False
-    ) -> bytes:
+    ) -> bytearray:
         """Build audio-only request"""
         header = AsrRequestHeader()
         if is_last:
@@ -173,7 +173,8 @@ class ASRService:
         request.extend(struct.pack(">I", len(compressed_segment)))
         request.extend(compressed_segment)
 
-        return bytes(request)
+        # send_bytes accepts any bytes-like object, no need to copy the frame
+        return request
 
     def _parse_response(self, msg: bytes) -> AsrResponse:
         """Parse server response"""
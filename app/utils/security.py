@@ -1,10 +1,20 @@
+import os
 from datetime import datetime, timedelta, timezone
 from typing import Optional
-from jose import jwt, JWTError
+import jwt
+from jwt import InvalidTokenError
 import bcrypt
 
 from app.config import settings
 
+# Bound once at import: settings are read-only after startup and these are
+# looked up on every request that carries a token
+_JWT_SECRET_KEY = settings.jwt_secret_key
+_JWT_ALGORITHM = settings.jwt_algorithm
+_JWT_ALGORITHMS = [settings.jwt_algorithm]
+_ACCESS_TOKEN_EXPIRE_DELTA = timedelta(minutes=settings.jwt_access_token_expire_minutes)
+_WS_TOKEN_EXPIRE_DELTA = timedelta(hours=2)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a bcrypt hash"""
@@ -14,11 +24,11 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     )
 
 
-def get_password_hash(password: str) -> str:
-    """Hash a password with bcrypt"""
+def get_password_hash(password: str, rounds: int = 12) -> str:
+    """Hash a password with bcrypt (rounds is the log2 work factor)"""
     return bcrypt.hashpw(
         password.encode("utf-8"),
-        bcrypt.gensalt(),
+        bcrypt.gensalt(rounds=rounds),
     ).decode("utf-8")
 
 
@@ -28,17 +38,14 @@ def create_access_token(
 ) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(
-            minutes=settings.jwt_access_token_expire_minutes
-        )
-    to_encode.update({"exp": expire})
+    expire = datetime.now(timezone.utc) + (expires_delta or _ACCESS_TOKEN_EXPIRE_DELTA)
+    # jti keeps two logins in the same second from minting the same token,
+    # so logging out one session cannot blacklist the other
+    to_encode.update({"exp": expire, "jti": os.urandom(8).hex()})
     encoded_jwt = jwt.encode(
         to_encode,
-        settings.jwt_secret_key,
-        algorithm=settings.jwt_algorithm,
+        _JWT_SECRET_KEY,
+        algorithm=_JWT_ALGORITHM,
     )
     return encoded_jwt
 
@@ -48,17 +55,17 @@ def decode_access_token(token: str) -> Optional[dict]:
     try:
         payload = jwt.decode(
             token,
-            settings.jwt_secret_key,
-            algorithms=[settings.jwt_algorithm],
+            _JWT_SECRET_KEY,
+            algorithms=_JWT_ALGORITHMS,
         )
         return payload
-    except JWTError:
+    except InvalidTokenError:
         return None
 
 
 def create_ws_token(conversation_id: int, user_id: int) -> str:
     """Create a WebSocket connection token"""
-    expire = datetime.now(timezone.utc) + timedelta(hours=2)
+    expire = datetime.now(timezone.utc) + _WS_TOKEN_EXPIRE_DELTA
     data = {
         "conversation_id": conversation_id,
         "user_id": user_id,
@@ -67,8 +74,8 @@ def create_ws_token(conversation_id: int, user_id: int) -> str:
     }
     return jwt.encode(
         data,
-        settings.jwt_secret_key,
-        algorithm=settings.jwt_algorithm,
+        _JWT_SECRET_KEY,
+        algorithm=_JWT_ALGORITHM,
     )
 
 
@@ -77,11 +84,11 @@ def decode_ws_token(token: str) -> Optional[dict]:
     try:
         payload = jwt.decode(
             token,
-            settings.jwt_secret_key,
-            algorithms=[settings.jwt_algorithm],
+            _JWT_SECRET_KEY,
+            algorithms=_JWT_ALGORITHMS,
         )
         if payload.get("type") != "ws":
             return None
         return payload
-    except JWTError:
+    except InvalidTokenError:
         return None
@@ -1,14 +1,26 @@
 """WebSocket module for AI real-time conversation"""
 
-from app.websocket.manager import ConnectionManager, connection_manager
-from app.websocket.handler import websocket_endpoint
-from app.websocket.protocol import WsEnvelope, ServerMessage, ConversationState
-
-__all__ = [
-    "ConnectionManager",
-    "connection_manager",
-    "websocket_endpoint",
-    "WsEnvelope",
-    "ServerMessage",
-    "ConversationState",
-]
+import importlib
+
+# Exports are resolved lazily (PEP 562) so that importing a light submodule
+# such as app.websocket.protocol does not pull in the handler and, through it,
+# the AI agent and its LLM/ASR/TTS clients.
+_EXPORTS = {
+    "ConnectionManager": "app.websocket.manager",
+    "connection_manager": "app.websocket.manager",
+    "websocket_endpoint": "app.websocket.handler",
+    "WsEnvelope": "app.websocket.protocol",
+    "ServerMessage": "app.websocket.protocol",
+    "ConversationState": "app.websocket.protocol",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,83 @@
+"""Per-frame VAD kernel: RMS, noise floor, barge-in and endpointing in one call"""
+
+import math
+from typing import Tuple
+
+import numpy as np
+
+END_SILENCE_MS = 1500
+SPEECH_DB_ABOVE_NOISE = 10.0
+BARGE_IN_DB_ABOVE_NOISE = 15.0
+BARGE_IN_MIN_MS = 200
+NEAR_SILENCE_DB_ABOVE_NOISE = 3.0
+# Noise floor EMA weights: track down quickly near silence, drift up slowly
+_EMA_FAST = 0.02
+_EMA_SLOW = 0.005
+
+
+def pcm_rms_db(pcm_bytes: bytes) -> float:
+    sample_count = len(pcm_bytes) // 2
+    if sample_count == 0:
+        return -100.0
+    # Zero-copy int16 view, widened once to float64 so the sum of squares is a
+    # single BLAS dot product (exact below 2**53, i.e. hours of full-scale PCM)
+    samples = np.frombuffer(pcm_bytes, dtype="<i2", count=sample_count).astype(np.float64)
+    sum_squares = float(np.dot(samples, samples))
+    rms = math.sqrt(sum_squares / sample_count)
+    if rms <= 0:
+        return -100.0
+    return 20.0 * math.log10(rms / 32768.0)
+
+
+def update_vad(
+    pcm_bytes: bytes,
+    noise_floor_db: float,
+    in_speech: bool,
+    silence_ms: float,
+    barge_in_frames: int,
+    frame_ms: float,
+    speaking_risk: bool,
+) -> Tuple[float, float, bool, float, int, bool, bool]:
+    """
+    Advance the VAD by one PCM frame.
+
+    Takes the current VAD fields as scalars and returns the new ones:
+    (rms_db, noise_floor_db, in_speech, silence_ms, barge_in_frames,
+    barge_in_triggered, end_of_speech). Endpointing only advances on frames
+    that are fed to ASR, i.e. outside the playback echo window or on barge-in.
+    """
+    rms_db = pcm_rms_db(pcm_bytes)
+
+    # Update noise floor slowly when near-silence
+    near_silence = rms_db < noise_floor_db + NEAR_SILENCE_DB_ABOVE_NOISE
+    alpha = _EMA_FAST if near_silence else _EMA_SLOW
+    noise_floor_db += alpha * (rms_db - noise_floor_db)
+    # Thresholds derived from the updated floor, computed once per frame
+    barge_in_threshold_db = noise_floor_db + BARGE_IN_DB_ABOVE_NOISE
+    speech_threshold_db = noise_floor_db + SPEECH_DB_ABOVE_NOISE
+
+    # Counters are updated arithmetically rather than through branches on the
+    # (unpredictable) loudness comparisons: a False factor resets them to 0.
+    above_barge_in = rms_db > barge_in_threshold_db
+    barge_in_frames = (barge_in_frames + 1) * above_barge_in * speaking_risk
+    barge_in_triggered = barge_in_frames * frame_ms >= BARGE_IN_MIN_MS
+
+    end_of_speech = False
+    if not speaking_risk or barge_in_triggered:
+        # VAD endpointing (backend authoritative)
+        above_speech = rms_db > speech_threshold_db
+        in_speech = in_speech or above_speech
+        silence_ms = (silence_ms + frame_ms) * (not above_speech) * in_speech
+        end_of_speech = silence_ms >= END_SILENCE_MS
+        in_speech = in_speech and not end_of_speech
+        silence_ms *= not end_of_speech
+
+    return (
+        rms_db,
+        noise_floor_db,
+        in_speech,
+        silence_ms,
+        barge_in_frames,
+        barge_in_triggered,
+        end_of_speech,
+    )
@@ -1,43 +1,46 @@
 """WebSocket endpoint handler for AI conversation"""
 
 from fastapi import WebSocket, WebSocketDisconnect, Query, Path
+from pydantic import ValidationError
+import orjson
+import pybase64
 from datetime import datetime, timezone
-import json
 import asyncio
-import base64
+import functools
+import hmac
 import logging
-from typing import Optional, Dict
-from collections import defaultdict
-from dataclasses import dataclass
-import math
+import time
+from typing import Awaitable, Callable, List, Optional, Dict, Union
+from dataclasses import dataclass, field
 
+from app.websocket._vad_kernel import update_vad
 from app.websocket.manager import connection_manager
-from app.websocket.protocol import WsEnvelope, ServerMessage, ConversationState
+from app.websocket.protocol import (
+    BINARY_TTS_AUDIO,
+    BINARY_USER_AUDIO,
+    WsEnvelope,
+    ServerMessage,
+    ConversationState,
+    pack_audio_frame,
+    unpack_audio_frame,
+)
 from app.utils.security import decode_ws_token
 from app.redis_client import redis_client
 from app.services.agent import ai_agent
 
 logger = logging.getLogger(__name__)
 
-# Streaming ASR session state per conversation
-asr_queues: Dict[int, asyncio.Queue] = {}
-asr_tasks: Dict[int, asyncio.Task] = {}
-interrupt_flags: Dict[int, bool] = defaultdict(bool)
-listening_since: Dict[int, Optional[datetime]] = {}  # Track when entered LISTENING state
-conv_states: Dict[int, ConversationState] = {}
-tts_last_chunk_sent_at: Dict[int, datetime] = {}
-current_stream_id: Dict[int, str] = {}
-
-@dataclass
+@dataclass(slots=True)
 class AudioConfig:
     format: str = "pcm_s16le"
     sample_rate: int = 16000
     channels: int = 1
     bits_per_sample: int = 16
     frame_ms: int = 20
+    binary_audio: bool = False  # client accepts TTS audio as binary frames
 
 
-@dataclass
+@dataclass(slots=True)
 class VADState:
     in_speech: bool = False
     silence_ms: float = 0.0
@@ -46,15 +49,55 @@ class VADState:
     last_frame_at: Optional[datetime] = None
 
 
-audio_configs: Dict[int, AudioConfig] = {}
-vad_states: Dict[int, VADState] = {}
+@dataclass(slots=True)
+class ConvRuntime:
+    """
+    In-process state for one connected conversation.
+
+    Kept in a single object so hot paths do one dict lookup per call.
+    Timers use time.monotonic(); wall-clock datetimes are only built when a
+    timestamp is persisted to Redis.
+    """
+    audio_config: AudioConfig = field(default_factory=AudioConfig)
+    vad: VADState = field(default_factory=VADState)
+    state: Optional[ConversationState] = None
+    listening_since: Optional[float] = None  # when LISTENING was entered
+    tts_last_at: Optional[float] = None  # last TTS audio chunk sent
+    current_stream_id: Optional[str] = None  # stream fed to the ASR session
+    mic_stream_id: Optional[str] = None  # open mic stream, from mic_start to mic_end
+    interrupt_flag: bool = False
+    last_active_written_at: Optional[float] = None  # last Redis write
+    # Streaming ASR session
+    asr_queue: Optional[asyncio.Queue] = None
+    asr_task: Optional[asyncio.Task] = None
+    asr_input_ended: bool = False  # end marker queued; later chunks are dropped
+    # Job queue drained in order by a single worker task
+    job_queue: Optional[asyncio.Queue] = None
+    job_worker: Optional[asyncio.Task] = None
+    audio_drop_notified: bool = False  # client told about the current overflow
+
+
+@dataclass(slots=True)
+class AudioFrame:
+    """A user audio frame waiting in the conversation job queue."""
+    stream_id: str
+    seq: int
+    pcm: Optional[memoryview] = None  # binary frames carry PCM directly
+    data_b64: Optional[str] = None  # JSON user_audio_chunk
+    vad_hint: Optional[str] = None
+
+
+runtimes: Dict[int, ConvRuntime] = {}
 IDLE_TIMEOUT_SECONDS = 60
 LISTENING_TIMEOUT_SECONDS = 60  # End conversation if no audio for 1 minute in LISTENING state
-END_SILENCE_MS = 1500
-SPEECH_DB_ABOVE_NOISE = 10.0
-BARGE_IN_DB_ABOVE_NOISE = 15.0
-BARGE_IN_MIN_MS = 200
 PLAYBACK_ECHO_WINDOW_MS = 1200
+CONV_JOB_QUEUE_SIZE = 50  # ~1s of 20ms audio frames
+ASR_QUEUE_SIZE = 250  # ~5s of 20ms frames; covers the ASR connect handshake
+AUDIO_BATCH_MAX_FRAMES = 8
+LAST_ACTIVE_WRITE_INTERVAL_SECONDS = 2.0
+TTS_AUDIO_BATCH_MS = 200  # coalesce TTS audio into ~200ms outbound chunks
+ASR_PARTIAL_INTERVAL_SECONDS = 0.1  # at most one asr_partial per 100ms
+ASR_PACKET_MAX_MS = 200  # cap on backlog merged into one ASR packet
 
 
 async def verify_connection(
@@ -67,6 +110,11 @@ async def verify_connection(
 
     Returns user_id if valid, None otherwise.
     """
+    # Each failed check picks a close code; the socket is closed once below
+    close_code: Optional[int] = None
+    close_reason = ""
+    token_user_id = None
+
     # Decode token
     payload = decode_ws_token(token)
     if not payload:
@@ -75,65 +123,89 @@ async def verify_connection(
             conversation_id,
             token[:12],
         )
-        await websocket.close(code=4001, reason="Invalid token")
-        return None
+        close_code, close_reason = 4001, "Invalid token"
 
     # Verify conversation_id matches
-    if payload.get("conversation_id") != conversation_id:
+    elif payload.get("conversation_id") != conversation_id:
         logger.warning(
             "[ws.verify] token conv_id mismatch url=%s token=%s user_id=%s",
             conversation_id,
             payload.get("conversation_id"),
             payload.get("user_id"),
         )
-        await websocket.close(code=4002, reason="Token does not match conversation")
-        return None
+        close_code, close_reason = 4002, "Token does not match conversation"
 
-    # Check if conversation exists in Redis
-    session = await redis_client.hgetall(f"conv:session:{conversation_id}")
-    if not session:
-        logger.warning(
-            "[ws.verify] session missing conv_id=%s user_id=%s",
-            conversation_id,
-            payload.get("user_id"),
-        )
-        await websocket.close(code=4003, reason="Conversation not found or expired")
-        return None
+    else:
+        token_user_id = payload.get("user_id")
+        # Check if conversation exists in Redis
+        session = await redis_client.hgetall(f"conv:session:{conversation_id}")
+        if not session:
+            logger.warning(
+                "[ws.verify] session missing conv_id=%s user_id=%s",
+                conversation_id,
+                token_user_id,
+            )
+            close_code, close_reason = 4003, "Conversation not found or expired"
 
-    # Verify user_id matches
-    session_user_id = int(session.get("user_id", 0))
-    token_user_id = payload.get("user_id")
-    if session_user_id != token_user_id:
-        logger.warning(
-            "[ws.verify] user mismatch conv_id=%s session_user_id=%s token_user_id=%s session=%s",
-            conversation_id,
-            session_user_id,
-            token_user_id,
-            session,
-        )
-        await websocket.close(code=4004, reason="User mismatch")
-        return None
+        # Verify user_id matches (constant-time compare of the decimal ids)
+        elif not hmac.compare_digest(
+            str(session.get("user_id", "")).encode(),
+            str(token_user_id).encode(),
+        ):
+            logger.warning(
+                "[ws.verify] user mismatch conv_id=%s session_user_id=%s token_user_id=%s session=%s",
+                conversation_id,
+                session.get("user_id"),
+                token_user_id,
+                session,
+            )
+            close_code, close_reason = 4004, "User mismatch"
 
-    # Check conversation status
-    if session.get("status") != "active":
-        logger.warning(
-            "[ws.verify] session not active conv_id=%s status=%s session=%s",
-            conversation_id,
-            session.get("status"),
-            session,
-        )
-        await websocket.close(code=4005, reason="Conversation is not active")
+        # Check conversation status
+        elif session.get("status") != "active":
+            logger.warning(
+                "[ws.verify] session not active conv_id=%s status=%s session=%s",
+                conversation_id,
+                session.get("status"),
+                session,
+            )
+            close_code, close_reason = 4005, "Conversation is not active"
+
+    if close_code is not None:
+        await websocket.close(code=close_code, reason=close_reason)
         return None
 
     return token_user_id
 
 
+def _get_runtime(conversation_id: int) -> ConvRuntime:
+    rt = runtimes.get(conversation_id)
+    if rt is None:
+        rt = runtimes[conversation_id] = ConvRuntime()
+    return rt
+
+
+def _mark_last_active(conversation_id: int) -> str:
+    """Record a last_active_at write for throttling and return the timestamp."""
+    _get_runtime(conversation_id).last_active_written_at = time.monotonic()
+    return datetime.now(timezone.utc).isoformat()
+
+
 async def update_last_active(conversation_id: int) -> None:
-    """Update last active timestamp for conversation"""
+    """
+    Update last active timestamp for conversation.
+
+    Writes are coalesced to at most one per LAST_ACTIVE_WRITE_INTERVAL_SECONDS,
+    since every audio frame and ping lands here. flush_state writes the final
+    value on disconnect.
+    """
+    last = _get_runtime(conversation_id).last_active_written_at
+    if last is not None and time.monotonic() - last < LAST_ACTIVE_WRITE_INTERVAL_SECONDS:
+        return
     await redis_client.hset(
         f"conv:session:{conversation_id}",
         "last_active_at",
-        datetime.now(timezone.utc).isoformat(),
+        _mark_last_active(conversation_id),
     )
 
 
@@ -143,69 +215,95 @@ async def store_message(
     msg_type: str,
     content: str,
 ) -> None:
-    """Store a message in Redis conversation history"""
+    """Store a message in Redis conversation history and refresh last_active_at"""
+    timestamp = _mark_last_active(conversation_id)
     message = {
         "role": role,
         "type": msg_type,
         "content": content,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": timestamp,
     }
-    await redis_client.rpush(
-        f"conv:messages:{conversation_id}",
-        json.dumps(message, ensure_ascii=False),
-    )
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.rpush(f"conv:messages:{conversation_id}", orjson.dumps(message))
+        pipe.hset(f"conv:session:{conversation_id}", "last_active_at", timestamp)
+        await pipe.execute()
 
 
 async def send_state_change(conversation_id: int, state: ConversationState) -> None:
     """Send state change message to client"""
+    rt = _get_runtime(conversation_id)
+    if rt.state == state:
+        # No transition: skip the client message and Redis write, but
+        # re-arm the listening timeout as a fresh LISTENING entry would
+        if state == ConversationState.LISTENING:
+            rt.listening_since = time.monotonic()
+        return
+    rt.state = state
     await connection_manager.send_message(
         conversation_id,
         ServerMessage.state(conversation_id, state.value),
     )
-    conv_states[conversation_id] = state
-    # Also update Redis session state
-    await redis_client.hset(
-        f"conv:session:{conversation_id}",
-        "state",
-        state.value,
-    )
+    # State is tracked in-process; flush_state persists it on disconnect
     # Track when we enter LISTENING state for timeout detection
     if state == ConversationState.LISTENING:
-        listening_since[conversation_id] = datetime.now(timezone.utc)
+        rt.listening_since = time.monotonic()
     else:
-        listening_since.pop(conversation_id, None)
+        rt.listening_since = None
+
+
+async def flush_state(conversation_id: int) -> None:
+    """Persist the final conversation state and last_active_at to Redis."""
+    rt = runtimes.get(conversation_id)
+    mapping = {"last_active_at": _mark_last_active(conversation_id)}
+    if rt is not None and rt.state is not None:
+        mapping["state"] = rt.state.value
+    await redis_client.hmset(f"conv:session:{conversation_id}", mapping)
 
 
 async def handle_ping(
     conversation_id: int,
-) -> WsEnvelope:
-    """Handle ping message, return pong"""
+) -> str:
+    """Handle ping message, return serialized pong"""
     await update_last_active(conversation_id)
-    return ServerMessage.pong(conversation_id)
-
-
-def _get_audio_config(conversation_id: int) -> AudioConfig:
-    return audio_configs.get(conversation_id, AudioConfig())
+    return ServerMessage.pong_json(conversation_id)
 
 
-def _get_vad_state(conversation_id: int) -> VADState:
-    if conversation_id not in vad_states:
-        vad_states[conversation_id] = VADState()
-    return vad_states[conversation_id]
-
+async def _flush_tts_audio(
+    conversation_id: int,
+    segment_id: int,
+    seq: int,
+    audio_buf: bytearray,
+    binary_audio: bool,
+) -> int:
+    """
+    Send buffered TTS audio as one chunk and clear the buffer.
 
-def _pcm_rms_db(pcm_bytes: bytes) -> float:
-    if len(pcm_bytes) < 2:
-        return -100.0
-    sample_count = len(pcm_bytes) // 2
-    sum_squares = 0
-    for i in range(0, sample_count * 2, 2):
-        sample = int.from_bytes(pcm_bytes[i : i + 2], "little", signed=True)
-        sum_squares += sample * sample
-    rms = math.sqrt(sum_squares / max(1, sample_count))
-    if rms <= 0:
-        return -100.0
-    return 20.0 * math.log10(rms / 32768.0)
+    Returns the next audio seq (unchanged if there was nothing to send).
+    """
+    if not audio_buf:
+        return seq
+    if binary_audio:
+        await connection_manager.send_bytes(
+            conversation_id,
+            pack_audio_frame(BINARY_TTS_AUDIO, seq, audio_buf, segment_id=segment_id),
+        )
+    else:
+        await connection_manager.send_message(
+            conversation_id,
+            ServerMessage.audio_chunk(
+                conv_id=conversation_id,
+                segment_id=segment_id,
+                seq=seq,
+                data_b64=pybase64.b64encode_as_string(audio_buf),
+                format="pcm_s16le",
+                sample_rate=ai_agent.tts.sample_rate,
+                channels=1,
+                bits_per_sample=16,
+            ),
+        )
+    audio_buf.clear()
+    _get_runtime(conversation_id).tts_last_at = time.monotonic()
+    return seq + 1
 
 
 def _estimate_frame_ms(pcm_bytes: bytes, config: AudioConfig) -> float:
@@ -232,8 +330,6 @@ async def handle_text_message(
        c. After audio_end: send board
     4. State: listening
     """
-    await update_last_active(conversation_id)
-
     preview = content.strip().replace("\n", " ")
     if len(preview) > 200:
         preview = preview[:200] + "..."
@@ -249,6 +345,10 @@ async def handle_text_message(
 
     segment_count = 0
     interrupted = False
+    rt = _get_runtime(conversation_id)
+    binary_audio = rt.audio_config.binary_audio
+    # 16-bit mono PCM
+    audio_batch_bytes = ai_agent.tts.sample_rate * 2 * TTS_AUDIO_BATCH_MS // 1000
 
     try:
         async for segment in ai_agent.process_text_with_segments(
@@ -256,7 +356,7 @@ async def handle_text_message(
             content,
             with_tts=False,
         ):
-            if await check_interrupt(conversation_id):
+            if check_interrupt(conversation_id):
                 logger.info(
                     "Segment response interrupted for conversation %s", conversation_id
                 )
@@ -285,16 +385,27 @@ async def handle_text_message(
             if segment.speech:
                 audio_seq = 0
                 text_seq = 0
+                audio_buf = bytearray()
                 async for ev in ai_agent.tts.synthesize_stream_events(
                     segment.speech,
-                    interrupt_check=lambda: interrupt_flags.get(conversation_id, False),
+                    interrupt_check=lambda: rt.interrupt_flag,
                 ):
-                    if await check_interrupt(conversation_id):
+                    # Per-chunk check stays in-process; handle_interrupt sets
+                    # the local flag alongside the Redis key
+                    if rt.interrupt_flag:
                         interrupted = True
                         break
 
                     if ev.name == "sentence_start":
                         if ev.text:
+                            # Keep audio ahead of the text that follows it
+                            audio_seq = await _flush_tts_audio(
+                                conversation_id,
+                                segment.segment_id,
+                                audio_seq,
+                                audio_buf,
+                                binary_audio,
+                            )
                             await connection_manager.send_message(
                                 conversation_id,
                                 ServerMessage.ai_text_delta(
@@ -306,25 +417,24 @@ async def handle_text_message(
                             )
                             text_seq += 1
                     elif ev.name == "audio":
-                        b64 = base64.b64encode(ev.audio or b"").decode("utf-8")
-                        await connection_manager.send_message(
+                        audio_buf += ev.audio or b""
+                        # Send the first chunk right away to keep time-to-audio low
+                        if audio_seq == 0 or len(audio_buf) >= audio_batch_bytes:
+                            audio_seq = await _flush_tts_audio(
+                                conversation_id,
+                                segment.segment_id,
+                                audio_seq,
+                                audio_buf,
+                                binary_audio,
+                            )
+                    elif ev.name == "finished":
+                        audio_seq = await _flush_tts_audio(
                             conversation_id,
-                            ServerMessage.audio_chunk(
-                                conv_id=conversation_id,
-                                segment_id=segment.segment_id,
-                                seq=audio_seq,
-                                data_b64=b64,
-                                format="pcm_s16le",
-                                sample_rate=ai_agent.tts.sample_rate,
-                                channels=1,
-                                bits_per_sample=16,
-                            ),
+                            segment.segment_id,
+                            audio_seq,
+                            audio_buf,
+                            binary_audio,
                         )
-                        tts_last_chunk_sent_at[conversation_id] = datetime.now(
-                            timezone.utc
-                        )
-                        audio_seq += 1
-                    elif ev.name == "finished":
                         await connection_manager.send_message(
                             conversation_id,
                             ServerMessage.audio_end(
@@ -337,6 +447,15 @@ async def handle_text_message(
 
                 if interrupted:
                     break
+                # The stream can end without "finished" (e.g. on its receive
+                # timeout); send whatever audio is still buffered
+                await _flush_tts_audio(
+                    conversation_id,
+                    segment.segment_id,
+                    audio_seq,
+                    audio_buf,
+                    binary_audio,
+                )
 
             if segment.board and not interrupted:
                 logger.info(
@@ -379,90 +498,98 @@ async def handle_text_message(
 async def handle_client_hello(conversation_id: int, payload: dict) -> None:
     await update_last_active(conversation_id)
     audio = payload.get("audio") or {}
-    audio_configs[conversation_id] = AudioConfig(
+    _get_runtime(conversation_id).audio_config = AudioConfig(
         format=audio.get("format", "pcm_s16le"),
         sample_rate=int(audio.get("sample_rate", 16000)),
         channels=int(audio.get("channels", 1)),
         bits_per_sample=int(audio.get("bits_per_sample", 16)),
         frame_ms=int(audio.get("frame_ms", 20)),
+        binary_audio=bool(payload.get("binary_audio", False)),
     )
 
 
 async def handle_mic_start(conversation_id: int, stream_id: str) -> None:
     await update_last_active(conversation_id)
-    current_stream_id[conversation_id] = stream_id
-    vad_states[conversation_id] = VADState()
+    rt = _get_runtime(conversation_id)
+    rt.current_stream_id = stream_id
+    rt.mic_stream_id = stream_id
+    rt.vad = VADState()
     await ensure_asr_session(conversation_id, stream_id)
 
 
-async def handle_user_audio_chunk(
+async def handle_user_audio_chunks(
     conversation_id: int,
-    stream_id: str,
-    seq: int,
-    audio_b64: str,
-    vad_hint: Optional[str] = None,
+    frames: List[AudioFrame],
 ) -> None:
+    """
+    Process a run of consecutive audio frames from the same stream.
+
+    Per-batch work (last-active write) is done once; VAD still advances frame
+    by frame so barge-in and endpointing keep their 20ms resolution.
+    """
     await update_last_active(conversation_id)
 
     try:
-        pcm_bytes = base64.b64decode(audio_b64)
-        config = _get_audio_config(conversation_id)
-        frame_ms = _estimate_frame_ms(pcm_bytes, config)
-        rms_db = _pcm_rms_db(pcm_bytes)
-        vad = _get_vad_state(conversation_id)
-
-        if conv_states.get(conversation_id) == ConversationState.LISTENING:
-            listening_since[conversation_id] = datetime.now(timezone.utc)
-
-        # Update noise floor slowly when near-silence
-        if rms_db < vad.noise_floor_db + 3:
-            vad.noise_floor_db = 0.98 * vad.noise_floor_db + 0.02 * rms_db
-        else:
-            vad.noise_floor_db = 0.995 * vad.noise_floor_db + 0.005 * rms_db
-
-        now = datetime.now(timezone.utc)
-        speaking_state = conv_states.get(conversation_id, ConversationState.IDLE)
-        last_tts = tts_last_chunk_sent_at.get(conversation_id)
-        recent_tts = (
-            last_tts is not None
-            and (now - last_tts).total_seconds() * 1000 < PLAYBACK_ECHO_WINDOW_MS
-        )
-        speaking_risk = speaking_state == ConversationState.SPEAKING or recent_tts
-
-        barge_in_triggered = False
-        if speaking_risk:
-            if rms_db > vad.noise_floor_db + BARGE_IN_DB_ABOVE_NOISE:
-                vad.barge_in_frames += 1
-            else:
-                vad.barge_in_frames = 0
-            if vad.barge_in_frames * frame_ms >= BARGE_IN_MIN_MS:
-                barge_in_triggered = True
-        else:
-            vad.barge_in_frames = 0
-
-        feed_asr = (not speaking_risk) or barge_in_triggered
-
-        if barge_in_triggered and speaking_state == ConversationState.SPEAKING:
-            logger.info("Barge-in detected conv_id=%s", conversation_id)
-            await handle_interrupt(conversation_id, reason="barge_in")
+        rt = _get_runtime(conversation_id)
+        config = rt.audio_config
+        echo_window_s = PLAYBACK_ECHO_WINDOW_MS / 1000.0
+        # VAD fields live in locals for the batch and are written back once
+        vad = rt.vad
+        noise_floor_db = vad.noise_floor_db
+        in_speech = vad.in_speech
+        silence_ms = vad.silence_ms
+        barge_in_frames = vad.barge_in_frames
+        try:
+            for frame in frames:
+                pcm_bytes = frame.pcm
+                if pcm_bytes is None:
+                    pcm_bytes = pybase64.b64decode(frame.data_b64, validate=False)
+                frame_ms = _estimate_frame_ms(pcm_bytes, config)
+
+                now = time.monotonic()
+                speaking_state = rt.state or ConversationState.IDLE
+                if speaking_state == ConversationState.LISTENING:
+                    rt.listening_since = now
+
+                last_tts = rt.tts_last_at
+                recent_tts = last_tts is not None and now - last_tts < echo_window_s
+                speaking_risk = speaking_state == ConversationState.SPEAKING or recent_tts
+
+                (
+                    _rms_db,
+                    noise_floor_db,
+                    in_speech,
+                    silence_ms,
+                    barge_in_frames,
+                    barge_in_triggered,
+                    end_of_speech,
+                ) = update_vad(
+                    pcm_bytes,
+                    noise_floor_db,
+                    in_speech,
+                    silence_ms,
+                    barge_in_frames,
+                    frame_ms,
+                    speaking_risk,
+                )
+                feed_asr = (not speaking_risk) or barge_in_triggered
 
-        if not feed_asr:
-            return
+                if barge_in_triggered and speaking_state == ConversationState.SPEAKING:
+                    logger.info("Barge-in detected conv_id=%s", conversation_id)
+                    await handle_interrupt(conversation_id, reason="barge_in")
 
-        queue = await ensure_asr_session(conversation_id, stream_id)
-        await queue.put(pcm_bytes)
+                if not feed_asr:
+                    continue
 
-        # VAD endpointing (backend authoritative)
-        if rms_db > vad.noise_floor_db + SPEECH_DB_ABOVE_NOISE:
-            vad.in_speech = True
-            vad.silence_ms = 0.0
-        else:
-            if vad.in_speech:
-                vad.silence_ms += frame_ms
-                if vad.silence_ms >= END_SILENCE_MS:
-                    vad.in_speech = False
-                    vad.silence_ms = 0.0
-                    await queue.put(None)
+                queue = await ensure_asr_session(conversation_id, frame.stream_id)
+                put_asr_chunk(conversation_id, queue, pcm_bytes)
+                if end_of_speech:
+                    put_asr_chunk(conversation_id, queue, None)
+        finally:
+            vad.noise_floor_db = noise_floor_db
+            vad.in_speech = in_speech
+            vad.silence_ms = silence_ms
+            vad.barge_in_frames = barge_in_frames
 
     except Exception as e:
         logger.error("Error processing audio message: %s", e)
@@ -474,6 +601,34 @@ async def handle_user_audio_chunk(
         await send_state_change(conversation_id, ConversationState.LISTENING)
 
 
+async def handle_binary_frame(conversation_id: int, data: bytes) -> None:
+    """
+    Queue a binary user audio frame for the open mic stream.
+
+    Rejected frames are only logged: they arrive ~50 times a second, so an
+    error envelope per frame would flood the client.
+    """
+    try:
+        frame_type, seq, _segment_id, pcm = unpack_audio_frame(data)
+    except ValueError as e:
+        logger.debug("Dropping malformed binary frame conv_id=%s: %s", conversation_id, e)
+        return
+
+    stream_id = _get_runtime(conversation_id).mic_stream_id
+    if frame_type != BINARY_USER_AUDIO or not stream_id:
+        logger.debug(
+            "Dropping unexpected binary frame conv_id=%s type=%s",
+            conversation_id,
+            frame_type,
+        )
+        return
+
+    await _enqueue_audio_frame(
+        conversation_id,
+        AudioFrame(stream_id=stream_id, seq=seq, pcm=pcm),
+    )
+
+
 async def handle_image_message(
     conversation_id: int,
     image_url: str,
@@ -483,8 +638,6 @@ async def handle_image_message(
 
     Store the image URL in conversation context for LLM reference.
     """
-    await update_last_active(conversation_id)
-
     # Store image in context vars
     await redis_client.hset(
         f"conv:vars:{conversation_id}",
@@ -509,87 +662,171 @@ async def handle_interrupt(conversation_id: int, reason: str = "user_tap") -> No
     """
     logger.info("Interrupt received for conversation %s reason=%s", conversation_id, reason)
 
-    # Set interrupt flag
-    await redis_client.set(
-        f"conv:interrupt:{conversation_id}",
-        "1",
-        ex=10,  # Expire after 10 seconds
-    )
-    interrupt_flags[conversation_id] = True
+    # Set interrupt flag and update session state in one round trip
+    _get_runtime(conversation_id).interrupt_flag = True
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.set(
+            f"conv:interrupt:{conversation_id}",
+            "1",
+            ex=10,  # Expire after 10 seconds
+        )
+        pipe.hset(f"conv:session:{conversation_id}", "tts_playing", "false")
+        await pipe.execute()
 
     await stop_asr_session(conversation_id)
 
-    # Update session state
-    await redis_client.hset(
-        f"conv:session:{conversation_id}",
-        "tts_playing",
-        "false",
-    )
-
     # Reset to listening state so the user can continue speaking
     await send_state_change(conversation_id, ConversationState.LISTENING)
 
 
 async def handle_mic_end(conversation_id: int, stream_id: str, last_seq: int) -> None:
     await update_last_active(conversation_id)
-    if current_stream_id.get(conversation_id) != stream_id:
+    rt = _get_runtime(conversation_id)
+    if rt.mic_stream_id == stream_id:
+        rt.mic_stream_id = None
+    if rt.current_stream_id != stream_id:
         return
-    queue = asr_queues.get(conversation_id)
+    queue = rt.asr_queue
     if queue:
-        await queue.put(None)
+        put_asr_chunk(conversation_id, queue, None)
 
 
-async def check_interrupt(conversation_id: int) -> bool:
-    """Check if there's an active interrupt signal"""
-    flag = await redis_client.get(f"conv:interrupt:{conversation_id}")
-    return flag == "1"
+def check_interrupt(conversation_id: int) -> bool:
+    """
+    Check if there's an active interrupt signal.
+
+    Interrupts only originate from handle_interrupt on the connection that
+    owns the conversation, which sets the local flag, so no Redis read is
+    needed here. The Redis key is still written for the agent.
+    """
+    return _get_runtime(conversation_id).interrupt_flag
 
 
 async def clear_interrupt(conversation_id: int) -> None:
     """Clear interrupt flag"""
     await redis_client.delete(f"conv:interrupt:{conversation_id}")
-    interrupt_flags[conversation_id] = False
+    _get_runtime(conversation_id).interrupt_flag = False
+
+
+def put_asr_chunk(
+    conversation_id: int,
+    queue: asyncio.Queue,
+    chunk: Optional[bytes],
+) -> None:
+    """
+    Queue PCM (or the None end-of-stream marker) for the ASR session.
+
+    The queue is bounded; when the ASR side falls behind, the oldest audio is
+    dropped so memory per connection stays capped and the newest speech wins.
+    Once the end marker is queued, later chunks are dropped instead: nothing
+    behind the marker is read, and evicting for them would discard the
+    utterance the marker closes.
+    """
+    rt = _get_runtime(conversation_id)
+    if rt.asr_input_ended:
+        return
+    if chunk is None:
+        rt.asr_input_ended = True
+    while queue.full():
+        queue.get_nowait()
+        logger.warning("ASR queue full, dropping oldest audio conv_id=%s", conversation_id)
+    queue.put_nowait(chunk)
 
 
 async def ensure_asr_session(conversation_id: int, stream_id: str) -> asyncio.Queue:
     """Ensure an ASR streaming session exists for this conversation."""
-    task = asr_tasks.get(conversation_id)
+    rt = _get_runtime(conversation_id)
+    task = rt.asr_task
     if (
         task
         and not task.done()
-        and current_stream_id.get(conversation_id) == stream_id
+        and rt.current_stream_id == stream_id
     ):
-        return asr_queues[conversation_id]
+        return rt.asr_queue
 
     if task and not task.done():
         await stop_asr_session(conversation_id)
 
-    current_stream_id[conversation_id] = stream_id
+    rt.current_stream_id = stream_id
     await clear_interrupt(conversation_id)
-    queue: asyncio.Queue = asyncio.Queue()
-    asr_queues[conversation_id] = queue
-    interrupt_flags[conversation_id] = False
+    queue: asyncio.Queue = asyncio.Queue(maxsize=ASR_QUEUE_SIZE)
+    rt.asr_queue = queue
+    rt.asr_input_ended = False
+    rt.interrupt_flag = False
     await send_state_change(conversation_id, ConversationState.LISTENING)
+    config = rt.audio_config
+    packet_max_bytes = (
+        config.sample_rate * config.channels * config.bits_per_sample // 8
+        * ASR_PACKET_MAX_MS // 1000
+    )
 
     async def audio_generator():
-        while True:
+        # Frames that queued up while the previous packet was being sent go
+        # out as one packet (up to ASR_PACKET_MAX_MS), merged into a reused
+        # buffer. transcribe_stream compresses each packet before pulling the
+        # next, so reuse is safe.
+        packet = bytearray()
+        ended = False
+        while not ended:
             chunk = await queue.get()
             if chunk is None:
                 break
-            yield chunk
+            if queue.empty():
+                yield chunk
+                continue
+            packet.clear()
+            packet += chunk
+            while len(packet) < packet_max_bytes and not queue.empty():
+                chunk = queue.get_nowait()
+                if chunk is None:
+                    ended = True
+                    break
+                packet += chunk
+            yield packet
 
     async def asr_worker():
         final_text = ""
         last_partial = ""
+        # Partials are throttled to one per ASR_PARTIAL_INTERVAL_SECONDS; a
+        # partial that arrives inside the window is held and the latest one
+        # is sent when the window closes, unless the final supersedes it.
+        partial_sent_at = 0.0
+        partial_timer: Optional[asyncio.TimerHandle] = None
+        partial_send: Optional[asyncio.Task] = None
+
+        async def send_partial() -> None:
+            nonlocal partial_sent_at
+            partial_sent_at = time.monotonic()
+            await connection_manager.send_message(
+                conversation_id,
+                ServerMessage.asr_partial(conversation_id, stream_id, last_partial),
+            )
+
+        def flush_partial() -> None:
+            nonlocal partial_timer, partial_send
+            partial_timer = None
+            partial_send = asyncio.create_task(send_partial())
+
+        async def settle_partial() -> None:
+            # Drop a held partial and let one already being sent go out
+            # first, so nothing follows the final.
+            nonlocal partial_timer
+            if partial_timer is not None:
+                partial_timer.cancel()
+                partial_timer = None
+            if partial_send is not None and not partial_send.done():
+                await partial_send
+
         try:
             async for result in ai_agent.asr.transcribe_stream(
                 audio_generator(),
-                interrupt_check=lambda: interrupt_flags.get(conversation_id, False),
+                interrupt_check=lambda: rt.interrupt_flag,
             ):
                 text = (result.text or "").strip()
                 if not text:
                     continue
                 if result.is_final:
+                    await settle_partial()
                     await connection_manager.send_message(
                         conversation_id,
                         ServerMessage.asr_final(conversation_id, stream_id, text),
@@ -597,11 +834,17 @@ async def ensure_asr_session(conversation_id: int, stream_id: str) -> asyncio.Qu
                     final_text = text
                     break
                 last_partial = text
-                await connection_manager.send_message(
-                    conversation_id,
-                    ServerMessage.asr_partial(conversation_id, stream_id, text),
-                )
+                if partial_timer is not None:
+                    continue
+                wait = partial_sent_at + ASR_PARTIAL_INTERVAL_SECONDS - time.monotonic()
+                if wait <= 0:
+                    await send_partial()
+                else:
+                    partial_timer = asyncio.get_running_loop().call_later(
+                        wait, flush_partial
+                    )
 
+            await settle_partial()
             if not final_text and last_partial:
                 await connection_manager.send_message(
                     conversation_id,
@@ -609,7 +852,7 @@ async def ensure_asr_session(conversation_id: int, stream_id: str) -> asyncio.Qu
                 )
                 final_text = last_partial
 
-            if final_text and not await check_interrupt(conversation_id):
+            if final_text and not check_interrupt(conversation_id):
                 await handle_text_message(conversation_id, final_text)
             else:
                 await send_state_change(conversation_id, ConversationState.LISTENING)
@@ -621,28 +864,140 @@ async def ensure_asr_session(conversation_id: int, stream_id: str) -> asyncio.Qu
             )
             await send_state_change(conversation_id, ConversationState.LISTENING)
         finally:
-            current_task = asyncio.current_task()
-            if asr_tasks.get(conversation_id) is current_task:
-                asr_tasks.pop(conversation_id, None)
-                asr_queues.pop(conversation_id, None)
-
-    asr_tasks[conversation_id] = asyncio.create_task(asr_worker())
+            if partial_timer is not None:
+                partial_timer.cancel()
+            if partial_send is not None and not partial_send.done():
+                partial_send.cancel()
+            if rt.asr_task is asyncio.current_task():
+                rt.asr_task = None
+                rt.asr_queue = None
+
+    rt.asr_task = asyncio.create_task(asr_worker())
     return queue
 
 
 async def stop_asr_session(conversation_id: int) -> None:
     """Stop any active ASR streaming session."""
-    queue = asr_queues.get(conversation_id)
-    if queue:
-        await queue.put(None)
-    task = asr_tasks.get(conversation_id)
+    rt = runtimes.get(conversation_id)
+    if rt is None:
+        return
+    if rt.asr_queue:
+        put_asr_chunk(conversation_id, rt.asr_queue, None)
+    task = rt.asr_task
+    if task and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    rt.current_stream_id = None
+
+
+async def _conversation_worker(conversation_id: int, queue: asyncio.Queue) -> None:
+    """
+    Run queued jobs for a conversation one at a time, in arrival order.
+
+    Audio frames that are already waiting are drained together (up to
+    AUDIO_BATCH_MAX_FRAMES) and handed to handle_user_audio_chunks as one batch.
+    """
+    pending: Optional[Union[AudioFrame, Callable[[], Awaitable[None]]]] = None
+    while True:
+        if pending is not None:
+            job, pending = pending, None
+        else:
+            job = await queue.get()
+        try:
+            if isinstance(job, AudioFrame):
+                frames = [job]
+                while len(frames) < AUDIO_BATCH_MAX_FRAMES and not queue.empty():
+                    item = queue.get_nowait()
+                    if not isinstance(item, AudioFrame) or item.stream_id != job.stream_id:
+                        pending = item
+                        break
+                    frames.append(item)
+                await handle_user_audio_chunks(conversation_id, frames)
+            else:
+                await job()
+        except Exception as e:
+            logger.error("Conversation job error conv_id=%s: %s", conversation_id, e)
+        if pending is None and queue.empty():
+            # Backlog cleared; the next overflow gets its own notice
+            rt = runtimes.get(conversation_id)
+            if rt is not None:
+                rt.audio_drop_notified = False
+
+
+def start_conversation_worker(conversation_id: int) -> None:
+    """Create the bounded job queue and its worker for a conversation."""
+    rt = _get_runtime(conversation_id)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=CONV_JOB_QUEUE_SIZE)
+    rt.job_queue = queue
+    rt.job_worker = asyncio.create_task(_conversation_worker(conversation_id, queue))
+
+
+def enqueue_conversation_job(
+    conversation_id: int,
+    job: Union[AudioFrame, Callable[[], Awaitable[None]]],
+) -> bool:
+    """
+    Queue a job for the conversation worker without blocking the receive loop.
+
+    Returns False if the job was dropped because the queue is full.
+    """
+    rt = runtimes.get(conversation_id)
+    queue = rt.job_queue if rt is not None else None
+    if queue is None:
+        return False
+    try:
+        queue.put_nowait(job)
+    except asyncio.QueueFull:
+        logger.warning("Conversation job queue full, dropping job conv_id=%s", conversation_id)
+        return False
+    return True
+
+
+def _evict_audio_frame(queue: asyncio.Queue) -> bool:
+    """Drop the oldest queued audio frame, keeping the order of everything else."""
+    jobs = [queue.get_nowait() for _ in range(queue.qsize())]
+    evicted = False
+    for i, job in enumerate(jobs):
+        if isinstance(job, AudioFrame):
+            del jobs[i]
+            evicted = True
+            break
+    for job in jobs:
+        queue.put_nowait(job)
+    return evicted
+
+
+async def _notify_audio_dropped(conversation_id: int) -> None:
+    """Tell the client its audio was dropped, once per queue overflow."""
+    rt = runtimes.get(conversation_id)
+    if rt is None or rt.audio_drop_notified:
+        return
+    rt.audio_drop_notified = True
+    await _send_error(conversation_id, 5001, "服务繁忙，部分音频已丢弃")
+
+
+async def _enqueue_audio_frame(conversation_id: int, frame: AudioFrame) -> None:
+    if not enqueue_conversation_job(conversation_id, frame):
+        await _notify_audio_dropped(conversation_id)
+
+
+async def stop_conversation_worker(conversation_id: int) -> None:
+    """Cancel the conversation worker and drop any pending jobs."""
+    rt = runtimes.get(conversation_id)
+    if rt is None:
+        return
+    task = rt.job_worker
+    rt.job_queue = None
+    rt.job_worker = None
     if task and not task.done():
         task.cancel()
         try:
             await task
         except asyncio.CancelledError:
             pass
-    current_stream_id.pop(conversation_id, None)
 
 
 def check_listening_timeout(conversation_id: int) -> bool:
@@ -651,14 +1006,97 @@ def check_listening_timeout(conversation_id: int) -> bool:
 
     Returns True if timeout exceeded, False otherwise.
     """
-    started = listening_since.get(conversation_id)
+    rt = runtimes.get(conversation_id)
+    started = rt.listening_since if rt is not None else None
     if started is None:
         return False
 
-    elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+    elapsed = time.monotonic() - started
     return elapsed > LISTENING_TIMEOUT_SECONDS
 
 
+async def _send_error(conversation_id: int, code: int, message: str) -> None:
+    await connection_manager.send_message(
+        conversation_id,
+        ServerMessage.error(conversation_id, code, message),
+    )
+
+
+async def _route_ping(conversation_id: int, payload: dict) -> None:
+    pong = await handle_ping(conversation_id)
+    await connection_manager.send_text(conversation_id, pong)
+
+
+async def _route_mic_start(conversation_id: int, payload: dict) -> None:
+    stream_id = payload.get("stream_id")
+    if stream_id:
+        await handle_mic_start(conversation_id, stream_id)
+    else:
+        await _send_error(conversation_id, 1001, "Missing stream_id")
+
+
+async def _route_user_audio_chunk(conversation_id: int, payload: dict) -> None:
+    stream_id = payload.get("stream_id")
+    audio_b64 = payload.get("data_b64")
+    seq = payload.get("seq")
+    if stream_id and audio_b64 is not None and seq is not None:
+        await _enqueue_audio_frame(
+            conversation_id,
+            AudioFrame(
+                stream_id=stream_id,
+                seq=int(seq),
+                data_b64=audio_b64,
+                vad_hint=payload.get("vad_hint"),
+            ),
+        )
+    else:
+        await _send_error(conversation_id, 1001, "Missing audio chunk data")
+
+
+async def _route_mic_end(conversation_id: int, payload: dict) -> None:
+    stream_id = payload.get("stream_id")
+    last_seq = payload.get("last_seq", 0)
+    if stream_id:
+        job = functools.partial(handle_mic_end, conversation_id, stream_id, int(last_seq))
+        if not enqueue_conversation_job(conversation_id, job):
+            # mic_end must not be lost: make room by dropping the oldest audio
+            # frame, or apply it now if the backlog holds no audio
+            rt = runtimes.get(conversation_id)
+            queue = rt.job_queue if rt is not None else None
+            if queue is not None and _evict_audio_frame(queue):
+                queue.put_nowait(job)
+                await _notify_audio_dropped(conversation_id)
+            else:
+                await job()
+    else:
+        await _send_error(conversation_id, 1001, "Missing stream_id")
+
+
+async def _route_image(conversation_id: int, payload: dict) -> None:
+    image_url = payload.get("image_url")
+    if image_url:
+        await handle_image_message(conversation_id, image_url)
+    else:
+        await _send_error(conversation_id, 1001, "Missing image URL")
+
+
+async def _route_interrupt(conversation_id: int, payload: dict) -> None:
+    await handle_interrupt(conversation_id)
+
+
+# Client message type -> handler(conversation_id, payload); one dict lookup
+# per frame instead of walking an if/elif chain
+MESSAGE_ROUTES: Dict[str, Callable[[int, dict], Awaitable[None]]] = {
+    "ping": _route_ping,
+    "client_hello": handle_client_hello,
+    "mic_start": _route_mic_start,
+    "user_audio_chunk": _route_user_audio_chunk,
+    "mic_end": _route_mic_end,
+    "image": _route_image,
+    "interrupt": _route_interrupt,
+}
+
+
 async def websocket_endpoint(
     websocket: WebSocket,
     conversation_id: int = Path(..., description="Conversation ID"),
@@ -672,6 +1110,10 @@ async def websocket_endpoint(
     Message Protocol (v2):
     - Client sends JSON envelope: {type, conv_id, msg_id, ts_ms, payload}
     - Server sends JSON envelope: {type, conv_id, msg_id, ts_ms, payload}
+    - Audio may instead travel as binary frames (8-byte header + PCM, see
+      protocol.AUDIO_FRAME_HEADER): uplink user audio for the current
+      mic_start stream, and downlink TTS audio once client_hello sets
+      binary_audio=true
     """
     # Verify token and get user_id
     user_id = await verify_connection(websocket, conversation_id, token)
@@ -680,6 +1122,7 @@ async def websocket_endpoint(
 
     # Accept connection and register
     await connection_manager.connect(websocket, conversation_id, user_id)
+    start_conversation_worker(conversation_id)
 
     # Send initial idle state
     await send_state_change(conversation_id, ConversationState.IDLE)
@@ -694,29 +1137,38 @@ async def websocket_endpoint(
 
     try:
         while True:
-            # Receive message
+            # Receive message (text envelope or binary audio frame)
             try:
-                data = await asyncio.wait_for(
-                    websocket.receive_json(),
+                frame = await asyncio.wait_for(
+                    websocket.receive(),
                     timeout=IDLE_TIMEOUT_SECONDS,
                 )
             except asyncio.TimeoutError:
                 await websocket.close(code=1000, reason="Idle timeout")
                 return
-            except json.JSONDecodeError:
-                await connection_manager.send_message(
-                    conversation_id,
-                    ServerMessage.error(conversation_id, 1001, "Invalid JSON format"),
-                )
+
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+
+            data = frame.get("bytes")
+            if data is not None:
+                await handle_binary_frame(conversation_id, data)
                 continue
 
-            # Parse message
+            raw = frame.get("text") or ""
+
+            # Parse and validate the envelope in a single pass (pydantic-core),
+            # instead of json.loads followed by WsEnvelope(**data)
             try:
-                message = WsEnvelope(**data)
-            except Exception as e:
+                message = WsEnvelope.model_validate_json(raw)
+            except ValidationError as e:
+                if any(err["type"] == "json_invalid" for err in e.errors()):
+                    error_message = "Invalid JSON format"
+                else:
+                    error_message = f"Invalid message format: {str(e)}"
                 await connection_manager.send_message(
                     conversation_id,
-                    ServerMessage.error(conversation_id, 1001, f"Invalid message format: {str(e)}"),
+                    ServerMessage.error(conversation_id, 1001, error_message),
                 )
                 continue
 
@@ -730,68 +1182,9 @@ async def websocket_endpoint(
             payload = message.payload or {}
 
             # Route message by type
-            if message.type == "ping":
-                pong = await handle_ping(conversation_id)
-                await connection_manager.send_message(conversation_id, pong)
-
-            elif message.type == "client_hello":
-                await handle_client_hello(conversation_id, payload)
-
-            elif message.type == "mic_start":
-                stream_id = payload.get("stream_id")
-                if stream_id:
-                    await handle_mic_start(conversation_id, stream_id)
-                else:
-                    await connection_manager.send_message(
-                        conversation_id,
-                        ServerMessage.error(conversation_id, 1001, "Missing stream_id"),
-                    )
-
-            elif message.type == "user_audio_chunk":
-                stream_id = payload.get("stream_id")
-                audio_b64 = payload.get("data_b64")
-                seq = payload.get("seq")
-                if stream_id and audio_b64 is not None and seq is not None:
-                    asyncio.create_task(
-                        handle_user_audio_chunk(
-                            conversation_id,
-                            stream_id,
-                            int(seq),
-                            audio_b64,
-                            payload.get("vad_hint"),
-                        )
-                    )
-                else:
-                    await connection_manager.send_message(
-                        conversation_id,
-                        ServerMessage.error(conversation_id, 1001, "Missing audio chunk data"),
-                    )
-
-            elif message.type == "mic_end":
-                stream_id = payload.get("stream_id")
-                last_seq = payload.get("last_seq", 0)
-                if stream_id:
-                    asyncio.create_task(
-                        handle_mic_end(conversation_id, stream_id, int(last_seq))
-                    )
-                else:
-                    await connection_manager.send_message(
-                        conversation_id,
-                        ServerMessage.error(conversation_id, 1001, "Missing stream_id"),
-                    )
-
-            elif message.type == "image":
-                image_url = payload.get("image_url")
-                if image_url:
-                    await handle_image_message(conversation_id, image_url)
-                else:
-                    await connection_manager.send_message(
-                        conversation_id,
-                        ServerMessage.error(conversation_id, 1001, "Missing image URL"),
-                    )
-
-            elif message.type == "interrupt":
-                await handle_interrupt(conversation_id)
+            route = MESSAGE_ROUTES.get(message.type)
+            if route is not None:
+                await route(conversation_id, payload)
             else:
                 logger.warning(
                     "Unknown ws message type conv_id=%s type=%s",
@@ -820,10 +1213,11 @@ async def websocket_endpoint(
             pass
     finally:
         # Clean up connection, ASR session, and listening state
+        await stop_conversation_worker(conversation_id)
         await stop_asr_session(conversation_id)
-        listening_since.pop(conversation_id, None)
-        audio_configs.pop(conversation_id, None)
-        vad_states.pop(conversation_id, None)
-        conv_states.pop(conversation_id, None)
-        tts_last_chunk_sent_at.pop(conversation_id, None)
+        try:
+            await flush_state(conversation_id)
+        except Exception as e:
+            logger.error(f"Failed to flush state for conversation {conversation_id}: {e}")
+        runtimes.pop(conversation_id, None)
         await connection_manager.disconnect(conversation_id)
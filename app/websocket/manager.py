@@ -3,6 +3,7 @@
 from typing import Dict, Optional
 from fastapi import WebSocket
 import asyncio
+import orjson
 from datetime import datetime, timezone
 
 from app.websocket.protocol import WsEnvelope
@@ -22,7 +23,7 @@ class ConnectionManager:
         self.active_connections: Dict[int, WebSocket] = {}
         # conversation_id -> user_id
         self.connection_users: Dict[int, int] = {}
-        # Lock for thread-safe operations
+        # Serializes replacing a conversation's connection (close old, accept new)
         self._lock = asyncio.Lock()
 
     async def connect(
@@ -50,36 +51,32 @@ class ConnectionManager:
             self.active_connections[conversation_id] = websocket
             self.connection_users[conversation_id] = user_id
 
-            # Update Redis session with connection status
-            await redis_client.hset(
-                f"conv:session:{conversation_id}",
-                "ws_connected",
-                "true",
-            )
-            await redis_client.hset(
-                f"conv:session:{conversation_id}",
-                "last_active_at",
-                datetime.now(timezone.utc).isoformat(),
-            )
+        # Update Redis session with connection status (single HSET), outside
+        # the lock so other connects are not serialized behind the round trip
+        await redis_client.hmset(
+            f"conv:session:{conversation_id}",
+            {
+                "ws_connected": "true",
+                "last_active_at": datetime.now(timezone.utc).isoformat(),
+            },
+        )
 
-            return True
+        return True
 
     async def disconnect(self, conversation_id: int) -> None:
         """
         Handle WebSocket disconnection.
         """
-        async with self._lock:
-            if conversation_id in self.active_connections:
-                del self.active_connections[conversation_id]
-            if conversation_id in self.connection_users:
-                del self.connection_users[conversation_id]
+        # Plain dict pops cannot interleave with other coroutines; no lock needed
+        self.active_connections.pop(conversation_id, None)
+        self.connection_users.pop(conversation_id, None)
 
-            # Update Redis session
-            await redis_client.hset(
-                f"conv:session:{conversation_id}",
-                "ws_connected",
-                "false",
-            )
+        # Update Redis session
+        await redis_client.hset(
+            f"conv:session:{conversation_id}",
+            "ws_connected",
+            "false",
+        )
 
     def get_connection(self, conversation_id: int) -> Optional[WebSocket]:
         """Get WebSocket connection for a conversation"""
@@ -106,7 +103,9 @@ class ConnectionManager:
         websocket = self.active_connections.get(conversation_id)
         if websocket:
             try:
-                await websocket.send_json(message.model_dump())
+                # Serialize straight to JSON in pydantic-core; envelopes stay
+                # text frames since binary frames are reserved for audio
+                await websocket.send_text(message.model_dump_json())
                 return True
             except Exception:
                 # Connection might be closed
@@ -114,6 +113,26 @@ class ConnectionManager:
                 return False
         return False
 
+    async def send_text(
+        self,
+        conversation_id: int,
+        text: str,
+    ) -> bool:
+        """
+        Send an already serialized message to a specific conversation.
+
+        Returns True if text was sent, False if connection not found.
+        """
+        websocket = self.active_connections.get(conversation_id)
+        if websocket:
+            try:
+                await websocket.send_text(text)
+                return True
+            except Exception:
+                await self.disconnect(conversation_id)
+                return False
+        return False
+
     async def send_json(
         self,
         conversation_id: int,
@@ -127,7 +146,7 @@ class ConnectionManager:
         websocket = self.active_connections.get(conversation_id)
         if websocket:
             try:
-                await websocket.send_json(data)
+                await websocket.send_text(orjson.dumps(data).decode())
                 return True
             except Exception:
                 await self.disconnect(conversation_id)
@@ -159,9 +178,11 @@ class ConnectionManager:
         Broadcast a message to all active connections.
         """
         disconnected = []
+        # Serialize once; every connection gets the same frame
+        data = message.model_dump_json()
         for conversation_id, websocket in self.active_connections.items():
             try:
-                await websocket.send_json(message.model_dump())
+                await websocket.send_text(data)
             except Exception:
                 disconnected.append(conversation_id)
 
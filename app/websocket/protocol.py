@@ -2,10 +2,11 @@
 
 from __future__ import annotations
 
-import uuid
-from datetime import datetime, timezone
+import os
+import struct
+import time
 from enum import Enum
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 from pydantic import BaseModel, Field
 
@@ -19,13 +20,40 @@ class ConversationState(str, Enum):
     SPEAKING = "speaking"
 
 
+# Binary audio frames: a fixed 8-byte little-endian header followed by raw PCM.
+# Header fields: frame type (u8), seq (u32), segment_id (u16), flags (u8).
+# The conversation is implied by the socket, so it is not repeated per frame.
+AUDIO_FRAME_HEADER = struct.Struct("<BIHB")
+BINARY_USER_AUDIO = 1
+BINARY_TTS_AUDIO = 2
+
+
+def pack_audio_frame(frame_type: int, seq: int, pcm: bytes, segment_id: int = 0) -> bytes:
+    """Build a binary audio frame (header + PCM)."""
+    return AUDIO_FRAME_HEADER.pack(frame_type, seq, segment_id, 0) + pcm
+
+
+def unpack_audio_frame(data: bytes) -> Tuple[int, int, int, memoryview]:
+    """
+    Split a binary audio frame into (frame_type, seq, segment_id, pcm).
+
+    pcm is a zero-copy view into data. Raises ValueError if the frame is
+    shorter than the header.
+    """
+    if len(data) < AUDIO_FRAME_HEADER.size:
+        raise ValueError("Binary frame shorter than audio header")
+    frame_type, seq, segment_id, _flags = AUDIO_FRAME_HEADER.unpack_from(data, 0)
+    return frame_type, seq, segment_id, memoryview(data)[AUDIO_FRAME_HEADER.size:]
+
+
 def now_ms() -> int:
     """UTC timestamp in milliseconds."""
-    return int(datetime.now(timezone.utc).timestamp() * 1000)
+    return time.time_ns() // 1_000_000
 
 
 def new_msg_id() -> str:
-    return str(uuid.uuid4())
+    # 128 random bits as hex: same uniqueness as uuid4 without building a UUID
+    return os.urandom(16).hex()
 
 
 class WsEnvelope(BaseModel):
@@ -38,12 +66,18 @@ class WsEnvelope(BaseModel):
     payload: Dict[str, Any] = Field(default_factory=dict)
 
 
+# pong has a fixed payload, so it is formatted from a template instead of
+# building and dumping an envelope; field order matches WsEnvelope
+_PONG_JSON = '{"type":"pong","conv_id":%d,"msg_id":"%s","ts_ms":%d,"payload":{}}'
+
+
 class ServerMessage:
     """Server message factory helpers."""
 
     @staticmethod
     def _make(conv_id: int, msg_type: str, payload: Optional[dict] = None) -> WsEnvelope:
-        return WsEnvelope(
+        # Server-built fields are already well-typed; skip validation
+        return WsEnvelope.model_construct(
             type=msg_type,
             conv_id=conv_id,
             msg_id=new_msg_id(),
@@ -150,3 +184,8 @@ class ServerMessage:
     @classmethod
     def pong(cls, conv_id: int) -> WsEnvelope:
         return cls._make(conv_id, "pong", {})
+
+    @staticmethod
+    def pong_json(conv_id: int) -> str:
+        """pong, already serialized."""
+        return _PONG_JSON % (conv_id, new_msg_id(), now_ms())
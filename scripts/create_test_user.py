@@ -13,22 +13,41 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from sqlalchemy import select
+from sqlalchemy import inspect, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.database import async_session_maker, engine, Base
 from app.models.user import StudentUser, ParentUser
 from app.models.binding import ParentStudentBinding
 from app.utils.security import get_password_hash
 
 
+def _create_missing_tables(sync_conn) -> list:
+    # One catalog query for the table list, instead of create_all's
+    # per-table existence check on every run
+    existing = set(inspect(sync_conn).get_table_names())
+    missing = [t for t in Base.metadata.sorted_tables if t.name not in existing]
+    if missing:
+        Base.metadata.create_all(sync_conn, tables=missing, checkfirst=False)
+    return [t.name for t in missing]
+
+
 async def create_tables():
-    """Create all tables"""
+    """Create any tables that do not exist yet"""
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    print("Tables created successfully")
+        created = await conn.run_sync(_create_missing_tables)
+    if created:
+        print(f"Tables created successfully: {', '.join(created)}")
+    else:
+        print("Tables already exist")
 
 
 async def create_or_get_student(
-    session, phone: str, password: str, nickname: str, create_missing: bool
+    session,
+    phone: str,
+    password: str,
+    nickname: str,
+    create_missing: bool,
+    bcrypt_rounds: int,
 ):
     result = await session.execute(select(StudentUser).where(StudentUser.phone == phone))
     student = result.scalar_one_or_none()
@@ -43,7 +62,7 @@ async def create_or_get_student(
 
     student = StudentUser(
         phone=phone,
-        password_hash=get_password_hash(password),
+        password_hash=get_password_hash(password, rounds=bcrypt_rounds),
         nickname=nickname,
         grade="senior_1",
         personality="活泼开朗，喜欢数学",
@@ -57,8 +76,7 @@ async def create_or_get_student(
         },
     )
     session.add(student)
-    await session.commit()
-    await session.refresh(student)
+    await session.flush()
     print(f"Created test student: id={student.id}, phone={phone}, password={password}")
     return student
 
@@ -80,37 +98,32 @@ async def create_or_get_parent(session, phone: str, nickname: str, create_missin
         nickname=nickname,
     )
     session.add(parent)
-    await session.commit()
-    await session.refresh(parent)
+    await session.flush()
     print(f"Created test parent: id={parent.id}, phone={phone}")
     return parent
 
 
 async def ensure_binding(session, parent_id: int, student_id: int, relation: str):
+    # Insert-or-skip against uq_parent_student_status in one statement,
+    # instead of a SELECT for the active binding followed by an INSERT
     result = await session.execute(
-        select(ParentStudentBinding).where(
-            ParentStudentBinding.parent_id == parent_id,
-            ParentStudentBinding.student_id == student_id,
-            ParentStudentBinding.status == 1,
+        pg_insert(ParentStudentBinding)
+        .values(
+            parent_id=parent_id,
+            student_id=student_id,
+            relation=relation,
+            status=1,
         )
+        .on_conflict_do_nothing(constraint="uq_parent_student_status")
+        .returning(ParentStudentBinding.id)
     )
-    existing_binding = result.scalar_one_or_none()
-
-    if existing_binding:
-        print(f"Binding already exists: id={existing_binding.id}")
-        return existing_binding
+    binding_id = result.scalar_one_or_none()
 
-    binding = ParentStudentBinding(
-        parent_id=parent_id,
-        student_id=student_id,
-        relation=relation,
-        status=1,
-    )
-    session.add(binding)
-    await session.commit()
-    await session.refresh(binding)
-    print(f"Created binding: id={binding.id}")
-    return binding
+    if binding_id is None:
+        print("Binding already exists")
+    else:
+        print(f"Created binding: id={binding_id}")
+    return binding_id
 
 
 async def create_test_users(args: argparse.Namespace):
@@ -122,6 +135,7 @@ async def create_test_users(args: argparse.Namespace):
             password=args.student_password,
             nickname=args.student_nickname,
             create_missing=args.create_missing,
+            bcrypt_rounds=args.bcrypt_rounds,
         )
         parent = await create_or_get_parent(
             session,
@@ -130,10 +144,14 @@ async def create_test_users(args: argparse.Namespace):
             create_missing=args.create_missing,
         )
         if not student or not parent:
+            # Keep whichever account was created
+            await session.commit()
             print("Skip binding: missing student or parent.")
             return
 
         await ensure_binding(session, parent.id, student.id, args.relation)
+        # Rows are only flushed above (for their ids); commit them together
+        await session.commit()
 
         print("\n" + "=" * 50)
         print("Test accounts ready:")
@@ -160,6 +178,12 @@ def parse_args() -> argparse.Namespace:
         help="Create student/parent if they do not exist.",
     )
     parser.add_argument("--skip-create-tables", action="store_true")
+    parser.add_argument(
+        "--bcrypt-rounds",
+        type=int,
+        default=4,
+        help="bcrypt work factor for a newly created student (dev only; app uses 12).",
+    )
     return parser.parse_args()
 
 
@@ -1,12 +1,25 @@
+import asyncio
 import os
-from typing import Generator
+from pathlib import Path
+from typing import AsyncGenerator, Generator, Optional, Union
 
 import httpx
 import pytest
 
+from app.schemas.auth import LoginData
+from app.schemas.base import BaseResponse
+from app.schemas.upload import UploadTokenData
+
+# http: call a running server at BASE_URL. asgi: serve app.main in-process
+# through TestClient (same routes, middleware and auth, no socket hop); it
+# still needs the database and Redis from .env.
+INTEGRATION_MODE = os.getenv("INTEGRATION_MODE", "http")
+
 
 @pytest.fixture(scope="session")
 def base_url() -> str:
+    if INTEGRATION_MODE == "asgi":
+        return "http://testserver/api/v1/student"
     return os.getenv("BASE_URL", "http://localhost:8093/api/v1/student")
 
 
@@ -19,13 +32,74 @@ def root_url(base_url: str) -> str:
 
 
 @pytest.fixture(scope="session")
-def client() -> Generator[httpx.Client, None, None]:
-    with httpx.Client(timeout=60.0) as session:
+def client(base_url: str) -> Generator[httpx.Client, None, None]:
+    if INTEGRATION_MODE == "asgi":
+        from fastapi.testclient import TestClient
+
+        from app.main import app
+
+        # The context manager runs the app's lifespan (Redis connect/close)
+        with TestClient(app, base_url=base_url) as session:
+            yield session
+        return
+
+    # One keep-alive pool for the whole run. HTTP/2 is only negotiated over
+    # TLS (e.g. a deployed server behind nginx); plain uvicorn is HTTP/1.1
+    limits = httpx.Limits(
+        max_keepalive_connections=32, max_connections=64, keepalive_expiry=60
+    )
+    with httpx.Client(
+        base_url=base_url,
+        http2=base_url.startswith("https://"),
+        timeout=httpx.Timeout(60.0, connect=3.0),
+        limits=limits,
+    ) as session:
+        yield session
+
+
+class _ThreadedAsyncClient:
+    """
+    Awaitable get/post over the in-process TestClient.
+
+    Requests run in worker threads and are served on the TestClient's own
+    event loop, which the app's database and Redis pools are bound to, so
+    gathered calls still overlap.
+    """
+
+    def __init__(self, client: httpx.Client):
+        self._client = client
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await asyncio.to_thread(self._client.get, url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await asyncio.to_thread(self._client.post, url, **kwargs)
+
+
+# What async_client yields: a real AsyncClient over HTTP, the thread wrapper in asgi mode
+AsyncTestClient = Union[httpx.AsyncClient, _ThreadedAsyncClient]
+
+
+@pytest.fixture
+async def async_client(
+    request: pytest.FixtureRequest, base_url: str
+) -> AsyncGenerator[AsyncTestClient, None]:
+    if INTEGRATION_MODE == "asgi":
+        yield _ThreadedAsyncClient(request.getfixturevalue("client"))
+        return
+
+    # For the slow Zhipu-backed endpoints, so independent calls can overlap
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        http2=base_url.startswith("https://"),
+        timeout=httpx.Timeout(60.0, connect=3.0),
+    ) as session:
         yield session
 
 
-@pytest.fixture(scope="function")
-def auth_token(client: httpx.Client, base_url: str) -> str:
+# Logging in costs a bcrypt verify on the server; do it once per run
+@pytest.fixture(scope="session")
+def auth_token(client: httpx.Client) -> Generator[str, None, None]:
     if os.getenv("RUN_INTEGRATION") != "1":
         pytest.skip("Set RUN_INTEGRATION=1 to run integration tests.")
 
@@ -34,15 +108,66 @@ def auth_token(client: httpx.Client, base_url: str) -> str:
     device_id = os.getenv("TEST_DEVICE_ID", "test_device")
 
     resp = client.post(
-        f"{base_url}/auth/login",
+        "/auth/login",
         json={"phone": phone, "password": password, "device_id": device_id},
     )
     assert resp.status_code == 200
-    payload = resp.json()
-    assert payload["code"] == 0, payload
-    return payload["data"]["token"]
+    login = BaseResponse[LoginData].model_validate_json(resp.content, strict=True)
+    assert login.code == 0, login.message
+    token = login.data.token
+    yield token
+
+    # Blacklist the session token so runs don't leave live tokens behind
+    client.post(
+        "/auth/logout",
+        headers={"Authorization": f"Bearer {token}"},
+    )
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session")
 def auth_headers(auth_token: str) -> dict:
     return {"Authorization": f"Bearer {auth_token}"}
+
+
+@pytest.fixture(scope="session")
+def upload_token(client: httpx.Client, auth_headers: dict) -> dict:
+    """/upload/token data, fetched once per run (or xdist worker)."""
+    resp = client.post(
+        "/upload/token",
+        headers=auth_headers,
+        json={"file_type": "image", "file_ext": "jpg"},
+    )
+    assert resp.status_code == 200
+    body = BaseResponse[UploadTokenData].model_validate_json(resp.content, strict=True)
+    assert body.code == 0, body.message
+    return body.data.model_dump()
+
+
+@pytest.fixture(scope="session")
+def uploaded_test_image(upload_token: dict) -> Optional[str]:
+    """
+    URL of the bundled test_solving.jpg after uploading it to OSS.
+
+    Writes a real object to the bucket, so only the Zhipu and conversation
+    tests request it. Returns None when the server hands out no STS
+    credentials.
+    """
+    if os.getenv("RUN_ZHIPU_TESTS") != "1" and os.getenv("RUN_CONVERSATION_TESTS") != "1":
+        pytest.skip("Set RUN_ZHIPU_TESTS=1 or RUN_CONVERSATION_TESTS=1 to upload the test image.")
+    if not (upload_token.get("access_key_id") and upload_token.get("bucket")):
+        return None
+
+    import oss2
+
+    auth = oss2.StsAuth(
+        upload_token["access_key_id"],
+        upload_token["access_key_secret"],
+        upload_token["security_token"],
+    )
+    # upload_url is https://<bucket>.<endpoint>
+    endpoint = upload_token["upload_url"].replace(f"{upload_token['bucket']}.", "", 1)
+    bucket = oss2.Bucket(auth, endpoint, upload_token["bucket"])
+    bucket.put_object_from_file(
+        upload_token["file_key"], str(Path(__file__).parent / "test_solving.jpg")
+    )
+    return upload_token["file_url"]
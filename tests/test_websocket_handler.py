@@ -0,0 +1,34 @@
+import asyncio
+
+from app.websocket import handler
+
+
+def test_put_asr_chunk_keeps_audio_queued_before_end_marker() -> None:
+    conversation_id = -1
+    queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+    try:
+        for i in range(3):
+            handler.put_asr_chunk(conversation_id, queue, f"pre{i}".encode())
+        handler.put_asr_chunk(conversation_id, queue, None)
+        # An open mic keeps sending silence after VAD ends the utterance
+        for i in range(3):
+            handler.put_asr_chunk(conversation_id, queue, f"post{i}".encode())
+
+        items = [queue.get_nowait() for _ in range(queue.qsize())]
+        assert items == [b"pre0", b"pre1", b"pre2", None]
+    finally:
+        handler.runtimes.pop(conversation_id, None)
+
+
+def test_put_asr_chunk_drops_oldest_audio_when_full() -> None:
+    conversation_id = -1
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+    try:
+        for i in range(3):
+            handler.put_asr_chunk(conversation_id, queue, f"a{i}".encode())
+        handler.put_asr_chunk(conversation_id, queue, None)
+
+        items = [queue.get_nowait() for _ in range(queue.qsize())]
+        assert items == [b"a2", None]
+    finally:
+        handler.runtimes.pop(conversation_id, None)